@@ -0,0 +1,356 @@
+# =============================================================================
+# JUPYTERLAB DOWNLOAD BLOCKER
+# =============================================================================
+# Download blocking handler and jupyter-fs extension hook used by
+# jupyter_server_config.py. Kept in its own module so the code is compiled
+# once and cached by importlib instead of being re-parsed with every config
+# file that needs it.
+#
+# Usage (in jupyter_server_config.py):
+#     from jupyter_download_blocker import SECURITY_HEADERS, hook_extension_loading
+#     hook_extension_loading()
+
+import sys
+import json
+import logging
+import importlib.abc
+import importlib.util
+from tornado.routing import Matcher
+from tornado.web import HTTPError, RequestHandler
+
+# Use Google's RE2 engine (linear-time matching) when the optional
+# google-re2 package is installed, falling back to the standard library
+try:
+    import re2 as _re
+except ImportError:
+    import re as _re
+
+# Initialize logger for tracking system behavior
+# It has no handler of its own and jupyter_server does not configure the root
+# logger, so it is re-parented to the server's logger (see _use_server_log) to
+# make its records show up, formatted, in the server log.
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def _use_server_log(log=None):
+    """
+    Route this module's records through the server's logger, the same way
+    jupyter_server attaches tornado's loggers to its own. Without an explicit
+    log, the running ServerApp's logger is used if there is one.
+    """
+    if log is None:
+        serverapp = sys.modules.get("jupyter_server.serverapp")
+        if serverapp is None or not serverapp.ServerApp.initialized():
+            return
+        log = serverapp.ServerApp.instance().log
+    logger.parent = log
+
+# =============================================================================
+# SECURITY HEADERS
+# =============================================================================
+# Defined once and shared by every response. jupyter_server_config.py installs
+# them as c.ServerApp.tornado_settings['headers'].
+SECURITY_HEADERS = {
+    # Content Security Policy: Restricts resource loading and execution
+    'Content-Security-Policy': "default-src 'self'; script-src 'self' 'unsafe-inline' 'unsafe-eval'; style-src 'self' 'unsafe-inline'; object-src 'none';",
+    
+    # Prevent browsers from automatically opening downloaded files
+    'X-Download-Options': 'noopen',
+    
+    # Prevent MIME type sniffing (security protection)
+    'X-Content-Type-Options': 'nosniff'
+}
+
+# =============================================================================
+# DOWNLOAD URL MATCHING
+# =============================================================================
+# Instead of registering one regex per download URL pattern (which Tornado
+# tests one after another on every request), all blocked paths are recognized
+# by a single anchored regex followed by a substring check.
+
+# Single alternation of all download URL prefixes, compiled once:
+# - Standard Jupyter file downloads (e.g., /files/myfile.txt)
+# - API-based downloads (e.g., /api/contents/myfile.txt/download)
+#   Lazy and bounded ([^?]*?) so the engine stops at the first "/download"
+#   segment instead of running to the end of the path and backtracking
+_BLOCK_RE = _re.compile(r"^/(?:files/|api/contents/[^?]*?/download(?:/|$))")
+
+
+def _is_blocked(path):
+    """
+    Return True if the request path is a download URL.
+
+    Matches the known download URLs with one regex call, then falls back to a
+    case-insensitive "/download/" substring test (catches edge cases).
+    """
+    return _BLOCK_RE.match(path) is not None or "/download/" in path.lower()
+
+
+class _BlockedPathMatcher(Matcher):
+    """
+    Tornado routing matcher that recognizes every download URL in one pass.
+
+    Registered as a single rule ahead of the regular handlers, so download
+    requests are routed to DownloadBlocker with at most one regex match.
+    """
+
+    def match(self, request):
+        if _is_blocked(request.path):
+            return {}
+        return None
+
+# =============================================================================
+# DOWNLOAD BLOCKING HANDLER
+# =============================================================================
+class DownloadBlocker(RequestHandler):
+    """
+    Custom Tornado RequestHandler that intercepts and blocks all download requests.
+    
+    HOW IT WORKS:
+    1. This handler replaces normal file serving handlers
+    2. When a download is attempted, it captures the request
+    3. Instead of serving the file, it returns a 403 Forbidden error
+    4. Logs the blocked attempt for monitoring
+    
+    WHAT IT BLOCKS:
+    - Direct file downloads via /files/* URLs
+    - API-based downloads via /api/contents/*/download
+    - Any URL pattern containing "download"
+    - All HTTP methods (GET, POST, PUT, DELETE, HEAD, OPTIONS, PATCH)
+    """
+    
+    # Static part of the JSON error body, serialized once at class definition.
+    # Only the blocked path is filled in per request.
+    _BODY_PREFIX = json.dumps({
+        "error": "File downloads are disabled",
+        "message": "This JupyterLab instance does not permit file downloads",
+    })[:-1].encode() + b', "blocked_path": '
+    _BODY_SUFFIX = b'}'
+    
+    def set_default_headers(self):
+        """
+        Set security headers for all responses.
+        These headers prevent browsers from attempting alternative download methods.
+
+        The headers come from c.ServerApp.tornado_settings['headers'] (see
+        SECURITY_HEADERS above). jupyter_server only applies them to its own
+        handlers, so this plain RequestHandler copies them over itself.
+        Tornado calls this again when rendering an error, so the headers are
+        also present on the 403 response raised below.
+        """
+        for name, value in self.settings.get('headers', {}).items():
+            self.set_header(name, value)
+    
+    def check_xsrf_cookie(self):
+        """
+        Skip the XSRF check (jupyter_server runs with xsrf_cookies=True).
+        
+        Tornado runs it before prepare() for POST/PUT/DELETE/PATCH, so a
+        token-less request would get the generic XSRF 403 and never be logged
+        as a blocked download. This handler never acts on the request, so there
+        is nothing for the check to protect.
+        """
+        pass
+    
+    def prepare(self):
+        """
+        Block the request before any HTTP method handler is dispatched.
+        Returns 403 Forbidden instead of serving the requested file.
+        
+        Raising here makes Tornado finish the request with the error response,
+        so no get/post/put/... methods are needed at all.
+        """
+        # Log the blocked attempt with the requested path
+        logger.warning("DOWNLOAD BLOCKED: %s", self.request.path)
+        
+        # Return 403 Forbidden (body rendered by write_error). Passed as reason,
+        # not log_message, so Tornado does not log a second warning per request
+        raise HTTPError(403, reason="Downloads disabled")
+    
+    def write_error(self, status_code, **kwargs):
+        """
+        Send the JSON error response to the browser (visible in Network tab).
+        Only the blocked path is encoded per request; the rest is pre-serialized.
+        """
+        if status_code != 403:
+            return super().write_error(status_code, **kwargs)
+        self.set_header("Content-Type", "application/json")
+        self.finish(self._BODY_PREFIX + json.dumps(self.request.path).encode() + self._BODY_SUFFIX)
+
+
+# A single rule routes every download URL to the blocking handler.
+# Built once here and reused by every extension load.
+_BLOCKING_RULES = [(_BlockedPathMatcher(), DownloadBlocker)]
+
+# =============================================================================
+# EXTENSION HOOK - THE CORE BLOCKING MECHANISM
+# =============================================================================
+# Module path of the jupyter-fs server extension (see jpserver_extensions in
+# jupyter_server_config.py)
+_JFS_EXTENSION = "jupyterfs.extension"
+
+# Marker attribute set on our wrapper loader and on the import hook, so that
+# re-loading the config file (e.g., --autoreload, JupyterHub respawn) does not
+# wrap the wrapper again or register the blocking handlers twice
+_HOOK_SENTINEL = "_dl_blocked"
+
+
+# Steps whose failure has already been logged with a full traceback. A step
+# that keeps failing (e.g., across reloads) is then reported in one line.
+_REPORTED_FAILURES = set()
+
+
+def _safe(log, label, fn, *args):
+    """
+    Call fn(*args) and return (True, result). Any exception is logged as
+    "<label>: <error>" with the given log method and (False, None) is returned
+    instead, so a failing step never stops Jupyter from starting.
+    
+    The first failure of each step is logged with its traceback, so the real
+    error is not masked; later failures of the same step log one line only.
+    """
+    try:
+        return True, fn(*args)
+    except Exception as e:
+        first_failure = label not in _REPORTED_FAILURES
+        _REPORTED_FAILURES.add(label)
+        log("%s: %s", label, e, exc_info=first_failure)
+        return False, None
+
+
+def _add_blocking_rules(serverapp):
+    """Install the download blocking rule on the server's web application."""
+    # Add these patterns directly to the top-level router, without a host
+    # matcher, so they apply to all hosts without evaluating a host regex.
+    # Moving the new rule to the front gives it the highest priority: it is
+    # checked before jupyter-fs and all other handlers.
+    router = serverapp.web_app.default_router
+    router.add_rules(_BLOCKING_RULES)
+    router.rules.insert(0, router.rules.pop())
+    
+    serverapp.log.info("Download blocking layer active - all downloads will be blocked")
+
+
+def _hook_jfs_extension(jfs_ext):
+    """
+    Wrap the jupyter-fs extension loader so it installs the blocking handlers.
+    Called with the jupyterfs.extension module as soon as it has been imported.
+    """
+    # jupyter_server is importing the extension, so its ServerApp exists by now
+    _use_server_log()
+    
+    try:
+        # Store reference to the original extension loading function
+        original_load = jfs_ext._load_jupyter_server_extension
+        
+        # Already wrapped by an earlier load of the config file
+        if getattr(original_load, _HOOK_SENTINEL, False):
+            return
+        
+        def blocking_load(serverapp):
+            """
+            Custom loading function that wraps the original jupyter-fs loader.
+            This function:
+            1. Loads jupyter-fs normally (full functionality preserved)
+            2. Adds our download blocking URL patterns to the web application
+            3. Returns control to Jupyter (system continues normally)
+            """
+            _use_server_log(serverapp.log)
+            
+            # STEP 1: Load original jupyter-fs extension
+            # This ensures all jupyter-fs functionality works normally
+            loaded, result = _safe(serverapp.log.warning, "Extension load warning",
+                                   original_load, serverapp)
+            if loaded:
+                serverapp.log.info("jupyter-fs extension loaded successfully")
+            
+            # STEP 2: Add download blocking URL patterns
+            # These patterns intercept download requests BEFORE they reach file handlers
+            _safe(serverapp.log.error, "CRITICAL: Could not add download blocking handlers",
+                  _add_blocking_rules, serverapp)
+            
+            # STEP 3: Return the original result to maintain normal Jupyter operation
+            return result
+        
+        # STEP 4: Replace the original extension loading function with our wrapper
+        # This means when Jupyter loads jupyter-fs, it actually calls our function
+        setattr(blocking_load, _HOOK_SENTINEL, True)
+        jfs_ext._load_jupyter_server_extension = blocking_load
+        
+        logger.info("Successfully hooked into jupyter-fs extension loading")
+        
+    except Exception as e:
+        logger.error("CRITICAL: Extension hook failed: %s", e, exc_info=True)
+        logger.error("Download blocking will NOT be active!")
+
+
+class _HookedLoader(importlib.abc.Loader):
+    """
+    Import loader wrapper that hooks jupyterfs.extension right after it runs.
+    Everything else is delegated to the original loader.
+    """
+
+    def __init__(self, loader):
+        self._loader = loader
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._loader.exec_module(module)
+        _hook_jfs_extension(module)
+
+
+class _JupyterFSImportHook(importlib.abc.MetaPathFinder):
+    """
+    One-shot import hook for jupyterfs.extension.
+
+    Importing jupyter-fs from the config file would load its whole module graph
+    at config parse time. Instead, this finder waits until jupyter_server's
+    extension machinery imports the extension and hooks it at that point.
+    """
+
+    def find_spec(self, fullname, path, target=None):
+        if fullname != _JFS_EXTENSION:
+            return None
+        # Step aside so the regular import machinery locates the module
+        sys.meta_path.remove(self)
+        spec = importlib.util.find_spec(fullname)
+        if spec is None or spec.loader is None:
+            return spec
+        spec.loader = _HookedLoader(spec.loader)
+        return spec
+
+
+# Marks the finder so hook_extension_loading() does not queue a second one
+setattr(_JupyterFSImportHook, _HOOK_SENTINEL, True)
+
+
+def hook_extension_loading():
+    """
+    This is the heart of the download blocking system.
+    
+    STRATEGY:
+    We intercept the jupyter-fs extension loading process and inject our blocking handlers
+    at the web application level.
+    
+    WHY THIS WORKS:
+    1. jupyter-fs handles ALL file operations when loaded (including standard Jupyter files)
+    2. By hooking into its loading process, we ensure our blocking happens AFTER
+       jupyter-fs is ready but BEFORE it starts serving files
+    3. URL patterns at the web app level catch ALL possible download requests
+    4. This single interception point blocks both standard Jupyter and S3 downloads
+    
+    The hook is applied lazily, when jupyter_server imports jupyterfs.extension
+    to load it, so the config file never imports a disabled extension.
+    """
+    jfs_ext = sys.modules.get(_JFS_EXTENSION)
+    if jfs_ext is not None:
+        # Already imported (e.g., by another config file): hook it right away
+        _hook_jfs_extension(jfs_ext)
+    elif not any(getattr(finder, _HOOK_SENTINEL, False) for finder in sys.meta_path):
+        sys.meta_path.insert(0, _JupyterFSImportHook())